@@ -1,205 +1,544 @@
 import asyncio
 import os
 import re
-import sqlite3
 import datetime # Added import
+import functools
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import urljoin, urlsplit
 from playwright.async_api import async_playwright, Error
 import aiohttp
-import aiofiles
+import aiosqlite
+from aiosqlitepool import SQLiteConnectionPool
+from selectolax.lexbor import LexborHTMLParser
+
+try:
+    import uvloop
+except ImportError: # uvloop isn't available on Windows; fall back to the default event loop
+    uvloop = None
+
+log = logging.getLogger(__name__)
 
 IMAGES_DIR = "images"
+VALID_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 DB_NAME = "hero_images.sqlite3"
+BROWSER_PROFILE_DIR = ".pw-profile" # Playwright user data dir reused across runs
+DOWNLOAD_CHUNK_SIZE = 64 * 1024 # Bytes read from the network per write when streaming images
+SINGLE_SHOT_MAX_BYTES = 1024 * 1024 # Images up to this size are read whole and written in one go
+DB_POOL_SIZE = 3 # SQLite serializes writers anyway, so a few connections are enough
+CONCURRENCY = 5 # Number of worker coroutines processing URLs in parallel
+PER_HOST_CONCURRENCY = 3 # Max pages of the same site processed at once, to stay polite to it
+# Connection settings: WAL journal with NORMAL sync avoids an extra fsync per commit,
+# and a larger in-memory cache/mmap keeps lookups off the disk
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+]
+SCHEMA_VERSION = 1 # Stored in PRAGMA user_version; bump when migrate_db gains a new step
+DB_BATCH_SIZE = 50 # Number of download results written per transaction
+# Insert new URLs and overwrite the status of previously failed ones in a single statement
+UPSERT_DOWNLOAD_SQL = """
+    INSERT INTO downloaded_images (url, successful_download, try_download_datetime, successful_download_datetime)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET
+        successful_download = excluded.successful_download,
+        try_download_datetime = excluded.try_download_datetime,
+        successful_download_datetime = excluded.successful_download_datetime
+"""
+# Subresources the browser fallback never needs to find the hero image in the DOM
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
+# Patterns used by sanitize_filename, compiled once at import time
+_SCHEME_RE = re.compile(r'^https?://[^/]+/') # Scheme and domain
+_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9_-]') # Invalid filename characters
 
+@functools.lru_cache(maxsize=1024)
 def sanitize_filename(url):
     """Sanitizes a URL to create a safe filename."""
-    # Remove scheme and domain
-    path = re.sub(r'^https?://[^/]+/', '', url)
-    # Remove trailing slash
-    path = path.rstrip('/')
-    # Replace invalid filename characters
-    sanitized = re.sub(r'[^a-zA-Z0-9_-]', '_', path)
-    # Limit length (optional)
-    return sanitized[:100] # Limit filename length
+    # Remove scheme and domain, remove trailing slash, replace invalid filename characters,
+    # and limit filename length
+    return _UNSAFE_RE.sub('_', _SCHEME_RE.sub('', url).rstrip('/'))[:100]
+
+@functools.lru_cache(maxsize=1024)
+def build_filepath(url, image_src):
+    """Builds the local path for the hero image of url, keeping the image's extension if it is a known one.
+
+    Returns (filepath, unusual_ext), where unusual_ext is the extension that was replaced by .jpg,
+    or None. Logging is left to the caller, since results are cached.
+    """
+    filename_base = sanitize_filename(url)
+    # Try to get extension from the URL path (ignoring any query string), default to .jpg
+    file_ext = os.path.splitext(urlsplit(image_src).path)[1] or ".jpg"
+    # Ensure extension starts with a dot
+    if not file_ext.startswith('.'):
+        file_ext = '.' + file_ext
+
+    # Basic check for valid image extensions
+    unusual_ext = None
+    if file_ext.lower() not in VALID_IMAGE_EXTENSIONS:
+        unusual_ext, file_ext = file_ext, ".jpg"
+
+    image_filename = f"{filename_base}{file_ext}"
+    return os.path.join(IMAGES_DIR, image_filename), unusual_ext
+
+def _write_bytes(path, data):
+    """Writes data to path; run in a worker thread so the event loop isn't blocked."""
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def _write_chunks(path, chunks):
+    """Writes chunks from a thread-safe queue to path until a None sentinel arrives."""
+    with open(path, 'wb') as f:
+        while (chunk := chunks.get()) is not None:
+            f.write(chunk)
+
+def _remove_partial(path):
+    """Removes a partially written download, if there is one."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
 async def download_image(session, url, filepath):
     """Downloads an image from a URL and saves it to filepath."""
+    # Write to a temporary name so an interrupted download never leaves a truncated image behind
+    partial_path = filepath + ".part"
     try:
         async with session.get(url) as response:
             response.raise_for_status() # Raise an exception for bad status codes
-            async with aiofiles.open(filepath, mode='wb') as f:
-                await f.write(await response.read())
-            print(f"  Successfully saved image to: {filepath}")
-            return True
+            if response.content_length is not None and response.content_length <= SINGLE_SHOT_MAX_BYTES:
+                # Typical hero images are small: read them whole and write with a single thread hop
+                data = await response.read()
+                await asyncio.to_thread(_write_bytes, partial_path, data)
+            else:
+                # Large or unknown size: stream to disk, handing chunks to a single writer thread
+                # instead of hopping to a thread for every chunk. The queue is unbounded, but disk
+                # writes outpace the network, so it holds only a chunk or two in practice.
+                chunks = SimpleQueue()
+                writer = asyncio.ensure_future(asyncio.to_thread(_write_chunks, partial_path, chunks))
+                try:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        if writer.done(): # Writer failed (e.g. disk error); stop reading, await raises below
+                            break
+                        chunks.put(chunk)
+                finally:
+                    chunks.put(None) # Tell the writer we're done, even if the stream failed
+                    await writer
+        os.replace(partial_path, filepath)
+        log.debug("Saved image to: %s", filepath)
+        return True
     except aiohttp.ClientError as e:
-        print(f"  Error downloading image {url}: {e}")
+        log.warning("Error downloading image %s: %s", url, e)
+        _remove_partial(partial_path)
+        return False
+    except asyncio.TimeoutError:
+        # Checked before IOError: on Python 3.11+ TimeoutError is an OSError subclass
+        log.warning("Timed out downloading image %s", url)
+        _remove_partial(partial_path)
         return False
     except IOError as e:
-        print(f"  Error saving image {filepath}: {e}")
+        log.warning("Error saving image %s: %s", filepath, e)
+        _remove_partial(partial_path)
         return False
 
-async def extract_hero_image_from_urls(urls: list[str], conn: sqlite3.Connection):
+async def connect_db() -> aiosqlite.Connection:
+    """Opens a database connection with the performance PRAGMAs applied.
+
+    Used as the connection factory of the pool, so every pooled connection is configured.
+    """
+    conn = await aiosqlite.connect(DB_NAME)
+    for pragma in SQLITE_PRAGMAS:
+        await conn.execute(pragma)
+    return conn
+
+def find_image_src_in_html(html: str, url: str):
+    """Finds the hero image source in a page's static HTML, or None if it isn't there."""
+    tree = LexborHTMLParser(html)
+    # Video pages expose the hero image through the og:image meta tag
+    if "/videos/" in url:
+        og_image = tree.css_first('meta[property="og:image"]')
+        if og_image is not None and og_image.attributes.get("content"):
+            return og_image.attributes["content"]
+    # Articles (and video pages without og:image) use the first figure image
+    figure_img = tree.css_first("figure img")
+    if figure_img is not None and figure_img.attributes.get("src"):
+        return figure_img.attributes["src"]
+    return None
+
+async def fetch_image_src_static(session: aiohttp.ClientSession, url: str):
+    """Fetches the page over plain HTTP and looks for the hero image without a browser.
+
+    Returns None if the page was fetched but has no hero image; fetch errors (bad status,
+    connection problems) are raised, since a browser wouldn't do any better on those pages.
+    """
+    async with session.get(url) as response:
+        response.raise_for_status()
+        html = await response.text()
+    return find_image_src_in_html(html, url)
+
+class PagePool:
+    """A pool of up to `size` Playwright pages in one context, created on first use.
+
+    The context itself is only launched (via `launch_context`) when the first page is needed,
+    so runs where every URL is resolved from static HTML never start a browser.
+    """
+
+    def __init__(self, launch_context, size: int):
+        self.launch_context = launch_context
+        self.context = None
+        self.launch_error = None
+        self.launch_lock = asyncio.Lock()
+        # Bounds concurrent checkouts (and so the number of pages); released even if creating a page fails
+        self.slots = asyncio.Semaphore(size)
+        self.idle = []
+
+    async def get_context(self):
+        async with self.launch_lock:
+            # A failed launch is remembered, so later URLs fail fast instead of retrying Chromium
+            if self.launch_error is not None:
+                raise self.launch_error
+            if self.context is None:
+                log.info("Launching browser for Playwright fallback.")
+                try:
+                    self.context = await self.launch_context()
+                except Exception as e:
+                    self.launch_error = e
+                    raise
+        return self.context
+
+    @asynccontextmanager
+    async def page(self):
+        """Checks out a page for the duration of the block and returns it to the pool."""
+        async with self.slots:
+            if self.idle:
+                page = self.idle.pop()
+            else:
+                context = await self.get_context()
+                page = await context.new_page()
+            try:
+                yield page
+            finally:
+                # A page that crashed or was closed can't be reused; the next checkout opens a new one
+                if not page.is_closed():
+                    self.idle.append(page)
+
+    async def close(self):
+        for page in self.idle:
+            await page.close()
+        self.idle.clear()
+        if self.context is not None:
+            await self.context.close() # Closing a persistent context also shuts down the browser
+
+# Runs in the page: the first figure image, or null if there is none
+FIND_HERO_IMAGE_JS = """() => {
+    const figureImg = document.querySelector('figure img');
+    return (figureImg && figureImg.getAttribute('src')) || null;
+}"""
+
+async def block_unneeded_resources(route):
+    """Aborts requests for subresources we don't need, letting everything else through."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def find_image_src_with_browser(page, url: str):
+    """Renders the page with Playwright and looks for the hero image in the live DOM."""
+    # Only article pages get here (video pages are resolved from static HTML), so look for the figure image
+    await page.goto(url, wait_until="domcontentloaded")
+    # One round-trip that returns null right away if the page has no figure image
+    return await page.evaluate(FIND_HERO_IMAGE_JS)
+
+async def process_url(url: str, previous_status, page_pool: PagePool, session: aiohttp.ClientSession):
+    """Extracts the hero image for a single URL and downloads it.
+
+    Returns the row to record in the database.
+    """
+    log.debug("Processing URL: %s", url)
+
+    if previous_status == 0:
+         log.debug("Previous download attempt failed for %s. Retrying.", url)
+    # Else (previous_status is None), it's a new URL
+
+    image_src = None
+    download_successful = False # Initialize default status
+    successful_download_time = None
+    # Record the start time of the attempt for this URL
+    try_download_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    try:
+        # Real Python pages are server-rendered, so the hero image is usually in the raw HTML
+        image_src = await fetch_image_src_static(session, url)
+
+        # Video pages carry their full OG metadata in the static HTML, so a browser won't find more
+        if not image_src and "/videos/" in url:
+            log.debug("Hero image not found in static HTML of video page %s, not trying the browser.", url)
+        # Fall back to a real browser only for article pages that need JavaScript
+        elif not image_src:
+            log.debug("Hero image not found in static HTML of %s, falling back to Playwright.", url)
+            async with page_pool.page() as page:
+                image_src = await find_image_src_with_browser(page, url)
+
+        if image_src:
+            log.debug("Found image source for %s: %s", url, image_src)
+            # Construct absolute URL if necessary (handles "/path", "//host/path" and relative paths)
+            image_src = urljoin(url, image_src)
+
+            image_filepath, unusual_ext = build_filepath(url, image_src)
+            if unusual_ext:
+                log.warning("Unusual file extension '%s' for %s, defaulting to .jpg", unusual_ext, url)
+
+            # Attempt download
+            download_successful = await download_image(session, image_src, image_filepath)
+            if download_successful:
+                 successful_download_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            # If download fails, download_successful remains False, successful_download_time remains None
+
+        else:
+            # This case means image source wasn't found
+            log.warning("Could not find image source for %s", url)
+            # download_successful remains False
+
+    except aiohttp.ClientError as e:
+        log.warning("Error fetching page %s: %s", url, e)
+        # download_successful remains False
+    except asyncio.TimeoutError:
+        # The session's ClientTimeout raises this, not a ClientError
+        log.warning("Timed out fetching page %s", url)
+        # download_successful remains False
+    except Error as e:
+        log.warning("Error processing page %s: %s", url, e)
+        # download_successful remains False
+    except Exception as e: # Catch other potential errors
+        log.warning("Error occurred for %s: %s", url, e)
+        # download_successful remains False
+
+    # The row is written to the database later, in a batch with other results
+    log.debug("Queued download status for: %s (Success: %s)", url, download_successful)
+    return (url, 1 if download_successful else 0, try_download_time, successful_download_time)
+
+async def migrate_db(conn: aiosqlite.Connection):
+    """Creates the table or brings an older one up to SCHEMA_VERSION; a no-op once it is current."""
+    async with conn.execute("PRAGMA user_version") as cur:
+        (user_version,) = await cur.fetchone()
+    if user_version >= SCHEMA_VERSION:
+        return # Schema already up to date, skip migrations entirely
+
+    # Create table with new columns
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS downloaded_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT UNIQUE NOT NULL,
+            successful_download INTEGER NOT NULL,
+            try_download_datetime TEXT NOT NULL,
+            successful_download_datetime TEXT
+        )
+    """)
+    # Add columns if they don't exist (for backward compatibility)
+    async with conn.execute("PRAGMA table_info(downloaded_images)") as cur:
+        columns = {col[1] for col in await cur.fetchall()}
+    if "successful_download" not in columns:
+        await conn.execute("ALTER TABLE downloaded_images ADD COLUMN successful_download INTEGER NOT NULL DEFAULT 0")
+        log.info("Added column 'successful_download' to table.")
+    if "try_download_datetime" not in columns:
+        await conn.execute("ALTER TABLE downloaded_images ADD COLUMN try_download_datetime TEXT NOT NULL DEFAULT ' '" ) # Default needed for existing rows
+        # Set a default for existing rows - might need adjustment based on desired default
+        await conn.execute("UPDATE downloaded_images SET try_download_datetime = ? WHERE try_download_datetime = ' '", (datetime.datetime.now(datetime.timezone.utc).isoformat(),))
+        log.info("Added column 'try_download_datetime' to table.")
+    if "successful_download_datetime" not in columns:
+        await conn.execute("ALTER TABLE downloaded_images ADD COLUMN successful_download_datetime TEXT")
+        log.info("Added column 'successful_download_datetime' to table.")
+    # Covering index so status lookups can be answered from the index without touching the table.
+    # The planner only prefers it over the UNIQUE index on url once statistics exist (see analyze_if_needed).
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_url_status ON downloaded_images(url, successful_download)")
+
+    await conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    await conn.commit()
+
+async def fetch_download_status(pool: SQLiteConnectionPool, urls: list[str]) -> dict[str, int]:
+    """Looks up the download status of all given URLs with as few queries as possible."""
+    status = {}
+    async with pool.connection() as conn:
+        # Stay well below SQLite's limit on the number of bound parameters per statement
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            async with conn.execute(f"SELECT url, successful_download FROM downloaded_images WHERE url IN ({placeholders})", chunk) as cur:
+                status.update(await cur.fetchall())
+    return status
+
+async def analyze_if_needed(pool: SQLiteConnectionPool):
+    """Gathers planner statistics for the table once it has rows, if none exist yet.
+
+    Without statistics SQLite looks URLs up through the UNIQUE index and then reads the table row;
+    with them it uses the covering idx_url_status. Stale statistics still pick the covering index,
+    so this only needs to happen once.
+    """
+    try:
+        async with pool.connection() as conn:
+            async with conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'") as cur:
+                has_stat_table = await cur.fetchone() is not None
+            if has_stat_table:
+                async with conn.execute("SELECT 1 FROM sqlite_stat1 WHERE tbl = 'downloaded_images'") as cur:
+                    if await cur.fetchone() is not None:
+                        return # Already analyzed
+            async with conn.execute("SELECT 1 FROM downloaded_images LIMIT 1") as cur:
+                if await cur.fetchone() is None:
+                    return # Nothing to analyze yet
+            await conn.execute("ANALYZE downloaded_images")
+            await conn.commit()
+            log.debug("Gathered query planner statistics for downloaded_images.")
+    except aiosqlite.Error as db_err:
+        log.warning("Error gathering database statistics: %s", db_err)
+
+async def flush_pending(pool: SQLiteConnectionPool, pending: list[tuple]):
+    """Writes all pending download results in one transaction and clears the list."""
+    if not pending:
+        return
+    # Take the rows now so results queued while we await the database go into the next batch
+    rows = pending[:]
+    pending.clear()
+    async with pool.connection() as conn:
+        try:
+            await conn.executemany(UPSERT_DOWNLOAD_SQL, rows)
+            await conn.commit()
+            log.debug("Saved download status for %d URL(s) to database.", len(rows))
+        except aiosqlite.Error as db_err:
+            log.warning("Error saving download status to database: %s", db_err)
+            await conn.rollback()
+
+class HostQueue:
+    """Hands out URLs grouped by the host of the page, with at most `per_host` of a host in flight.
+
+    A worker whose next host is at its limit takes a URL of another host instead of waiting;
+    it only waits when every host with URLs left is busy.
+    """
+
+    def __init__(self, urls: list[str], per_host: int):
+        self.per_host = per_host
+        self.remaining = {} # Host -> URLs not handed out yet, in input order
+        for url in urls:
+            self.remaining.setdefault(urlsplit(url).netloc, deque()).append(url)
+        self.in_flight = {} # Host -> number of its URLs being processed
+        self.changed = asyncio.Condition()
+
+    def __len__(self):
+        return sum(len(urls) for urls in self.remaining.values())
+
+    async def get(self):
+        """Returns the next URL whose host has a free slot, or None once every URL was handed out."""
+        async with self.changed:
+            while self.remaining:
+                for host, urls in self.remaining.items():
+                    if self.in_flight.get(host, 0) < self.per_host:
+                        url = urls.popleft()
+                        if not urls:
+                            del self.remaining[host]
+                        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+                        return url
+                await self.changed.wait() # Every host with URLs left is busy
+            return None
+
+    async def done(self, url: str):
+        """Frees the slot taken by url's host, waking workers waiting for one."""
+        async with self.changed:
+            self.in_flight[urlsplit(url).netloc] -= 1
+            self.changed.notify_all()
+
+async def worker(host_queue: HostQueue, status: dict[str, int], page_pool: PagePool, session: aiohttp.ClientSession, db_pool: SQLiteConnectionPool, db_lock: asyncio.Lock, pending: list[tuple]):
+    """Takes URLs from the host queue until none are left."""
+    while (url := await host_queue.get()) is not None:
+        try:
+            row = await process_url(url, status.get(url), page_pool, session)
+        finally:
+            await host_queue.done(url)
+        pending.append(row)
+        if len(pending) >= DB_BATCH_SIZE:
+            async with db_lock:
+                await flush_pending(db_pool, pending)
+
+async def extract_hero_image_from_urls(urls: list[str], db_pool: SQLiteConnectionPool):
     """Extracts hero images, checks DB, downloads if new or failed, and updates DB."""
     if not os.path.exists(IMAGES_DIR):
         os.makedirs(IMAGES_DIR)
-        print(f"Created directory: {IMAGES_DIR}")
+        log.info("Created directory: %s", IMAGES_DIR)
 
-    async with async_playwright() as p, aiohttp.ClientSession() as session:
-        browser = await p.chromium.launch()
-        page = await browser.new_page()
-        print("Extracting and downloading hero images...")
-        cur = conn.cursor()
-        for url in urls:
-            print(f"Processing URL: {url}")
+    # Drop duplicate URLs, keeping the original order
+    urls = list(dict.fromkeys(urls))
 
-            # Check if URL already exists and was successfully downloaded
-            cur.execute("SELECT successful_download FROM downloaded_images WHERE url = ?", (url,))
-            result = cur.fetchone()
+    # Load the status of every URL up front instead of querying once per URL
+    status = await fetch_download_status(db_pool, urls)
 
-            if result and result[0] == 1:
-                print(f"  Image for URL already successfully downloaded: {url}. Skipping.")
-                continue # Skip to the next URL
-            elif result and result[0] == 0:
-                 print(f"  Previous download attempt failed for {url}. Retrying.")
-            # Else (result is None), it's a new URL
+    to_process = []
+    for url in urls:
+        if status.get(url) == 1:
+            log.debug("Image for URL already successfully downloaded: %s. Skipping.", url)
+            continue
+        to_process.append(url)
+    # Grouped by host, so one site never gets more than PER_HOST_CONCURRENCY workers
+    # while URLs of other sites are waiting
+    host_queue = HostQueue(to_process, PER_HOST_CONCURRENCY)
+    db_lock = asyncio.Lock() # One batch write at a time; SQLite only allows a single writer
+    pending: list[tuple] = [] # Download results waiting to be written to the database
 
-            image_src = None
-            download_successful = False # Initialize default status
-            successful_download_time = None
-            # Record the start time of the attempt for this URL
-            try_download_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    # All pages and images come from a handful of hosts, so keep connections and DNS lookups warm
+    connector = aiohttp.TCPConnector(limit=50, limit_per_host=10, ttl_dns_cache=300, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=30, connect=5)
 
+    async with async_playwright() as p, aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def launch_browser_context():
+            # One shared persistent context with a small viewport, so the HTTP cache and cookies
+            # survive between runs
+            context = await p.chromium.launch_persistent_context(
+                user_data_dir=BROWSER_PROFILE_DIR,
+                headless=True,
+                viewport={"width": 800, "height": 600},
+                args=["--disable-dev-shm-usage"],
+            )
+            await context.route("**/*", block_unneeded_resources)
+            return context
+
+        # Workers check pages out of the pool only when they need the browser
+        page_pool = PagePool(launch_browser_context, CONCURRENCY)
+        log.info("Extracting and downloading hero images...")
+        num_workers = min(CONCURRENCY, len(host_queue))
+        workers = [asyncio.create_task(worker(host_queue, status, page_pool, session, db_pool, db_lock, pending)) for _ in range(num_workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # If a worker failed or the run was interrupted, stop the remaining workers first...
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            # ...then save the finished results, so their images aren't downloaded again next time
             try:
-                await page.goto(url, wait_until="domcontentloaded")
-
-                # Check if it's a video page
-                if "/videos/" in url:
-                    print("  Video URL detected, checking og:image meta tag.")
-                    og_image_locator = page.locator('meta[property="og:image"]').first
-                    image_src = await og_image_locator.get_attribute("content")
-                    if not image_src:
-                        print("  Could not find og:image meta tag or content attribute.")
-                
-                # If not a video page or og:image failed, try the figure approach
-                if not image_src:
-                    print("  Checking 'figure img' selector.")
-                    image_locator = page.locator("figure img").first
-                    image_src = await image_locator.get_attribute("src")
-                    if not image_src:
-                         print(f"  Could not find src attribute for 'figure img'")
-
-
-                if image_src:
-                    print(f"  Found Image Source: {image_src}")
-                    # Construct absolute URL if necessary
-                    if image_src.startswith('/'):
-                        # Check if already absolute path starting with //
-                        if image_src.startswith('//'):
-                             image_src = url.split(':')[0] + ":" + image_src
-                        else:
-                            base_url = "/".join(url.split('/')[:3])
-                            image_src = base_url + image_src
-
-                    filename_base = sanitize_filename(url)
-                    # Try to get extension from URL, default to .jpg
-                    file_ext = os.path.splitext(image_src)[1] or ".jpg"
-                    # Ensure extension starts with a dot
-                    if not file_ext.startswith('.'):
-                        file_ext = '.' + file_ext
-                        
-                    # Basic check for valid image extensions
-                    valid_extensions = [".jpg", ".jpeg", ".png", ".gif", ".webp"]
-                    if file_ext.lower() not in valid_extensions:
-                        print(f"  Warning: Unusual file extension '{file_ext}', defaulting to .jpg")
-                        file_ext = ".jpg"
-
-                    image_filename = f"{filename_base}{file_ext}"
-                    image_filepath = os.path.join(IMAGES_DIR, image_filename)
-
-                    # Attempt download
-                    download_successful = await download_image(session, image_src, image_filepath)
-                    if download_successful:
-                         successful_download_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
-                    # If download fails, download_successful remains False, successful_download_time remains None
-
-                else:
-                    # This case means image source wasn't found
-                    print(f"  Could not find image source using either method.")
-                    # download_successful remains False
-
-            except Error as e:
-                print(f"  Error processing page: {e}")
-                # download_successful remains False
-            except Exception as e: # Catch other potential errors
-                print(f"  Error occurred: {e}")
-                # download_successful remains False
-
-            # Database logging happens AFTER try-except block to capture all outcomes
-            try:
-                if result is None: # New URL, perform INSERT
-                    cur.execute("""
-                        INSERT INTO downloaded_images (url, successful_download, try_download_datetime, successful_download_datetime)
-                        VALUES (?, ?, ?, ?)
-                    """, (url, 1 if download_successful else 0, try_download_time, successful_download_time))
-                    print(f"  Inserted download status into database for: {url} (Success: {download_successful})")
-                else: # Existing URL (must have failed before), perform UPDATE
-                    cur.execute("""
-                        UPDATE downloaded_images
-                        SET successful_download = ?, try_download_datetime = ?, successful_download_datetime = ?
-                        WHERE url = ?
-                    """, (1 if download_successful else 0, try_download_time, successful_download_time, url))
-                    print(f"  Updated download status in database for: {url} (Success: {download_successful})")
-
-                conn.commit()
-            except sqlite3.Error as db_err:
-                 print(f"  Error saving download status to database: {db_err}")
-                 conn.rollback()
-
-        await browser.close()
+                async with db_lock:
+                    await flush_pending(db_pool, pending)
+                    await analyze_if_needed(db_pool)
+            finally:
+                await page_pool.close()
 
 
 async def main():
-    print("Starting Real Python Hero Image Extractor!")
+    log.info("Starting Real Python Hero Image Extractor!")
 
-    # Initialize database connection and create/update table if it doesn't exist
-    conn = None
+    # Pool of long-lived database connections, each configured by connect_db
+    db_pool = SQLiteConnectionPool(connect_db, pool_size=DB_POOL_SIZE)
+
+    # Initialize database and create/update table if it doesn't exist
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        # Create table with new columns
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS downloaded_images (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                url TEXT UNIQUE NOT NULL,
-                successful_download INTEGER NOT NULL,
-                try_download_datetime TEXT NOT NULL,
-                successful_download_datetime TEXT
-            )
-        """)
-        # Add columns if they don't exist (for backward compatibility)
-        try:
-            cur.execute("ALTER TABLE downloaded_images ADD COLUMN successful_download INTEGER NOT NULL DEFAULT 0")
-            print("Added column 'successful_download' to table.")
-        except sqlite3.OperationalError:
-            pass # Column likely already exists
-        try:
-            cur.execute("ALTER TABLE downloaded_images ADD COLUMN try_download_datetime TEXT NOT NULL DEFAULT ' '" ) # Default needed for existing rows
-            # Set a default for existing rows - might need adjustment based on desired default
-            cur.execute("UPDATE downloaded_images SET try_download_datetime = ? WHERE try_download_datetime = ' '", (datetime.datetime.now(datetime.timezone.utc).isoformat(),))
-            print("Added column 'try_download_datetime' to table.")
-        except sqlite3.OperationalError:
-            pass # Column likely already exists
-        try:
-            cur.execute("ALTER TABLE downloaded_images ADD COLUMN successful_download_datetime TEXT")
-            print("Added column 'successful_download_datetime' to table.")
-        except sqlite3.OperationalError:
-            pass # Column likely already exists
-
-        conn.commit()
-        print(f"Database '{DB_NAME}' initialized/updated.")
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        if conn:
-            conn.close()
+        async with db_pool.connection() as conn:
+            await migrate_db(conn)
+        log.debug("Database '%s' initialized/updated.", DB_NAME)
+    except aiosqlite.Error as e:
+        log.error("Database error: %s", e)
+        await db_pool.close()
         return # Exit if database initialization fails
 
 
@@ -212,14 +551,32 @@ async def main():
         "https://realpython.com/invalid-url-test/", # Added for testing error handling
     ]
 
-    if conn: # Proceed only if connection is successful
-        try:
-            await extract_hero_image_from_urls(urls, conn)
-        finally:
-            # Ensure the database connection is closed
-             print("Closing database connection.")
-             conn.close()
+    try:
+        await extract_hero_image_from_urls(urls, db_pool)
+    finally:
+        # Ensure the pooled database connections are closed
+        log.debug("Closing database connections.")
+        await db_pool.close()
+
+
+def setup_logging():
+    """Routes log records through a queue so writing them to the console happens on a background thread."""
+    log_queue = SimpleQueue()
+    # QueueHandler formats the record before enqueueing it, so the format is set here
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+    listener = QueueListener(log_queue, logging.StreamHandler())
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    listener.start()
+    return listener
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    log_listener = setup_logging()
+    try:
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
+    finally:
+        log_listener.stop() # Flush any queued records before exiting